@@ -27,16 +27,24 @@ Implementation Notes
 
 import time
 import struct
+import array
+import digitalio
 from micropython import const
 from adafruit_bus_device import i2c_device
 from adafruit_register.i2c_struct import ROUnaryStruct, UnaryStruct
-from adafruit_register.i2c_bit import RWBit, ROBit
-from adafruit_register.i2c_bits import ROBits
+from adafruit_register.i2c_bit import RWBit
 
 try:
-    from typing import Dict, Optional, Union, List
+    # CPython 3.11+ maps this straight to libm, CircuitPython doesn't have it
+    from math import exp2 as _exp2
+except ImportError:
+    _exp2 = None
+
+try:
+    from typing import Dict, Optional, Union, List, Sequence
     from typing_extensions import Literal
     from busio import I2C
+    from microcontroller import Pin
 except ImportError:
     pass
 
@@ -62,7 +70,7 @@ MODE_SLEEP = 0x00
 MODE_IDLE = 0x01
 MODE_STANDARD = 0x02
 MODE_RESET = 0xF0
-_valid_modes = (MODE_SLEEP, MODE_IDLE, MODE_STANDARD, MODE_RESET)
+_VALID_MODES = {MODE_SLEEP, MODE_IDLE, MODE_STANDARD, MODE_RESET}
 
 NORMAL_OP = 0x00
 WARM_UP = 0x01
@@ -74,27 +82,76 @@ COMMAND_CLRGPR = 0xCC
 COMMAND_GETAPPVER = 0x0E
 
 
+def _temp_c10_to_raw(temp_c10: int) -> int:
+    # round((t / 10 + 273.15) * 64), with 273.15 * 64 * 10 = 174816
+    return (temp_c10 * 64 + 174821) // 10
+
+
+def _temp_c_to_raw(temp_c: float) -> int:
+    if isinstance(temp_c, int):
+        return _temp_c10_to_raw(temp_c * 10)
+    return int((temp_c + 273.15) * 64.0 + 0.5)
+
+
+def _hum_perc10_to_raw(hum_perc10: int) -> int:
+    return (hum_perc10 * 512 + 5) // 10
+
+
+def _hum_perc_to_raw(hum_perc: float) -> int:
+    if isinstance(hum_perc, int):
+        return _hum_perc10_to_raw(hum_perc * 10)
+    return int(hum_perc * 512 + 0.5)
+
+
+if _exp2 is not None:
+
+    def _decode_resistances(raw: Sequence[int], out: array.array) -> None:
+        for i, x in enumerate(raw):
+            out[i] = int(_exp2(x * (1.0 / 2048.0)))
+
+else:
+
+    def _decode_resistances(raw: Sequence[int], out: array.array) -> None:
+        for i, x in enumerate(raw):
+            out[i] = int(2.0 ** (x * (1.0 / 2048.0)))
+
+
 class ENS160:
     """Driver for the ENS160 air quality sensor
 
     :param ~busio.I2C i2c_bus: The I2C bus the ENS160 is connected to.
     :param int address: The I2C device address. Defaults to :const:`0x53`
+    :param ~microcontroller.Pin int_pin: Optional pin connected to the sensor's INT
+        output. When given, the sensor is set up to signal new data and GPR on it
+        and :meth:`wait_for_sample` can be used instead of polling. Defaults to `None`
+
+    :attr:`AQI`, :attr:`TVOC`, :attr:`eCO2` and :attr:`data_validity` are cached:
+    they hold the values from the last :meth:`refresh` (or
+    :attr:`new_data_available`) and do not read the sensor themselves.
     """
 
+    __slots__ = (
+        "i2c_device",
+        "_buf",
+        "_validity",
+        "_aqi",
+        "_tvoc",
+        "_eco2",
+        "_resistances",
+        "_int",
+    )
+
+    # preset register addresses for the burst reads
+    _CMD_STATUS = b"\x20"
+    _CMD_GPR = b"\x48"
+
     part_id = ROUnaryStruct(_ENS160_REG_PARTID, "<H")
     _mode = UnaryStruct(_ENS160_REG_OPMODE, "<B")
     _temp_in = UnaryStruct(_ENS160_REG_TEMPIN, "<H")
     _rh_in = UnaryStruct(_ENS160_REG_RHIN, "<H")
-    _status = UnaryStruct(_ENS160_REG_STATUS, "<B")
 
     # sensor data registers
     command = UnaryStruct(_ENS160_REG_COMMAND, "<B")
-    _new_GPR_available = ROBit(_ENS160_REG_STATUS, 0)
-    _new_data_available = ROBit(_ENS160_REG_STATUS, 1)
-    data_validity = ROBits(2, _ENS160_REG_STATUS, 2)
-    AQI = ROBits(2, _ENS160_REG_AQI, 0)
-    TVOC = ROUnaryStruct(_ENS160_REG_TVOC, "<H")
-    eCO2 = ROUnaryStruct(_ENS160_REG_ECO2, "<H")
 
     # interrupt register bits
     interrupt_polarity = RWBit(_ENS160_REG_CONFIG, 6)
@@ -103,24 +160,42 @@ class ENS160:
     interrupt_on_data = RWBit(_ENS160_REG_CONFIG, 1)
     interrupt_enable = RWBit(_ENS160_REG_CONFIG, 0)
 
-    def __init__(self, i2c_bus: I2C, address: int = ENS160_I2CADDR_DEFAULT) -> None:
+    def __init__(
+        self,
+        i2c_bus: I2C,
+        address: int = ENS160_I2CADDR_DEFAULT,
+        int_pin: Optional[Pin] = None,
+    ) -> None:
         self.i2c_device = i2c_device.I2CDevice(i2c_bus, address)
+        self._buf = bytearray(8)
 
         if self.part_id != 0x160:
             raise RuntimeError("Unable to find ENS160, check your wiring")
         self.clear_command()
         self.mode = MODE_STANDARD
-        self._buf = bytearray(8)
-        # Buffered readings for when we read all at once
-        self._bufferdict = {
-            "AQI": None,
-            "TVOC": None,
-            "eCO2": None,
-            "Resistances": [None, None, None, None],
-        }
+        # Cached status and readings from the last refresh()
+        self._validity = INVALID_OUT
+        self._aqi = 0
+        self._tvoc = 0
+        self._eco2 = 0
+        # Resistances from the last GPR read, updated in place
+        self._resistances = array.array("I", (0, 0, 0, 0))
         # Initialize with 'room temperature & humidity'
-        self.temperature_compensation = 25
-        self.humidity_compensation = 50
+        self.set_compensation(25, 50)
+
+        self._int = None
+        if int_pin is not None:
+            # push-pull, active low, fire on new data and new GPR
+            self.interrupt_pushpull = True
+            self.interrupt_polarity = False
+            self.interrupt_on_data = True
+            self.interrupt_on_GPR = True
+            self.interrupt_enable = True
+            self._int = digitalio.DigitalInOut(int_pin)
+            self._int.switch_to_input(pull=digitalio.Pull.UP)
+
+        # fill the caches so the data properties are never stale placeholders
+        self.refresh()
 
     def reset(self) -> None:
         """Perform a soft reset command"""
@@ -131,59 +206,155 @@ class ENS160:
         """Clears out custom data"""
         self.command = COMMAND_NOP
         self.command = COMMAND_CLRGPR
+        # CLRGPR has no completion signal, so give it a fixed time
         time.sleep(0.01)
 
+    def _wait_gpr(self, timeout: float = 0.05) -> None:
+        """Poll STATUS until the new GPR bit is set, raising if it does not show
+        up within timeout seconds. The bit is only cleared by reading GPR_READ,
+        so do that before issuing the command being waited on."""
+        buf = self._buf
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.i2c_device as i2c:
+                i2c.write_then_readinto(self._CMD_STATUS, buf, in_end=1)
+            if buf[0] & 0x01:
+                return
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for ENS160 GPR data")
+            time.sleep(0.001)
+
     def _read_gpr(self) -> None:
         """Read 8 bytes of general purpose registers into self._buf"""
-        self._buf[0] = _ENS160_REG_GPRREAD
         with self.i2c_device as i2c:
-            i2c.write_then_readinto(self._buf, self._buf, out_end=1)
+            i2c.write_then_readinto(self._CMD_GPR, self._buf)
+
+    def _refresh_status_block(self) -> int:
+        """Burst read STATUS, AQI, TVOC and eCO2 into the caches, returns STATUS"""
+        buf = self._buf
+        # STATUS, AQI, TVOC and eCO2 are contiguous (0x20-0x25)
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(self._CMD_STATUS, buf, in_end=6)
+        status, self._aqi, self._tvoc, self._eco2 = struct.unpack_from("<BBHH", buf)
+        # decode the validity field once here rather than on every access
+        self._validity = (status >> 2) & 3
+        return status
+
+    def refresh(self) -> None:
+        """Read the status and sensor data registers in a single burst and
+        update the cached :attr:`data_validity`, :attr:`AQI`, :attr:`TVOC`
+        and :attr:`eCO2` values. Call this once per loop before reading them."""
+        self._refresh_status_block()
+
+    @property
+    def data_validity(self) -> int:
+        """Validity of the sensor output as of the last :meth:`refresh`, one of
+        NORMAL_OP, WARM_UP, START_UP or INVALID_OUT"""
+        return self._validity
+
+    @property
+    def AQI(self) -> int:  # pylint: disable=invalid-name
+        """Air Quality Index (1-5) as of the last :meth:`refresh`"""
+        return self._aqi
+
+    @property
+    def TVOC(self) -> int:  # pylint: disable=invalid-name
+        """Total Volatile Organic Compounds in ppb as of the last :meth:`refresh`"""
+        return self._tvoc
+
+    @property
+    def eCO2(self) -> int:  # pylint: disable=invalid-name
+        """Equivalent CO2 in ppm as of the last :meth:`refresh`"""
+        return self._eco2
 
     @property
     def new_data_available(self) -> bool:
         """This function is wierd, it checks if there's new data or
         GPR (resistances) and if so immediately reads it into the
         internal buffer... otherwise the status is lost!"""
-        # we'll track if we actually read new data!
-        newdat = False
+        status = self._refresh_status_block()
 
-        if self._new_data_available:
-            self._buf[0] = _ENS160_REG_AQI
-            with self.i2c_device as i2c:
-                i2c.write_then_readinto(self._buf, self._buf, out_end=1, in_end=5)
-            (
-                self._bufferdict["AQI"],
-                self._bufferdict["TVOC"],
-                self._bufferdict["eCO2"],
-                _,
-                _,
-                _,
-            ) = struct.unpack("<BHHBBB", self._buf)
-            newdat = True
-
-        if self._new_GPR_available:
+        if status & 0x01:
             self._read_gpr()
-            for i, x in enumerate(struct.unpack("<HHHH", self._buf)):
-                self._bufferdict["Resistances"][i] = int(pow(2, x / 2048.0))
-            newdat = True
+            # resistance is 2^(raw / 2048) ohms
+            _decode_resistances(
+                struct.unpack_from("<HHHH", self._buf), self._resistances
+            )
 
-        return newdat
+        # AQI/TVOC/eCO2 were already cached by refresh()
+        return bool(status & 0x03)
+
+    @property
+    def resistances(self) -> array.array:
+        """The four sensor resistances in ohms from the last GPR read, as
+        buffered by :attr:`new_data_available`. This is the driver's internal
+        array and is overwritten in place on every read, copy it (or use
+        :meth:`read_all_sensors`) to keep a snapshot"""
+        return self._resistances
+
+    @staticmethod
+    def decode_resistances(raw: Sequence[int]) -> array.array:
+        """Convert a batch of raw 16-bit GPR resistance words, such as a
+        data logger's accumulated samples, into resistances in ohms
+
+        :param raw: The raw resistance words, any sequence of ints
+        :return: The resistances in ohms, in the same order
+        """
+        out = array.array("I", raw)
+        _decode_resistances(out, out)
+        return out
+
+    def wait_for_sample(self, timeout: float = 2.0) -> bool:
+        """Wait for the sensor to assert its INT pin, then read the new data
+        as :attr:`new_data_available` does. The pin is checked every 10 ms and no
+        I2C traffic happens while waiting. Requires ``int_pin`` to have been passed in.
+
+        :param float timeout: Maximum time to wait in seconds. Defaults to 2.0
+        :return: `True` if new data or GPR was read, `False` on timeout
+        """
+        if self._int is None:
+            raise RuntimeError("wait_for_sample() requires int_pin to be set")
+        deadline = time.monotonic() + timeout
+        # INT is active low
+        while self._int.value:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return self.new_data_available
+
+    def deinit(self) -> None:
+        """Release the INT pin, if one was given, so it can be reused"""
+        if self._int is not None:
+            self._int.deinit()
+            self._int = None
 
     def read_all_sensors(self) -> Dict[str, Optional[Union[int, List[int]]]]:
-        """All of the currently buffered sensor information"""
+        """All of the currently buffered sensor information, as a new dict
+        on each call"""
         # return the currently buffered deets
-        return self._bufferdict
+        return {
+            "AQI": self._aqi,
+            "TVOC": self._tvoc,
+            "eCO2": self._eco2,
+            "Resistances": list(self._resistances),
+        }
 
     @property
     def firmware_version(self) -> str:
         """Read the semver firmware version from the general registers"""
         curr_mode = self.mode
-        self.mode = MODE_IDLE
-        self.clear_command()
-        time.sleep(0.01)
-        self.command = COMMAND_GETAPPVER
-        self._read_gpr()
-        self.mode = curr_mode
+        self._set_mode_fast(MODE_IDLE)
+        try:
+            self.clear_command()
+            # clear the new GPR flag, whether left over from the last
+            # measurement or raised by CLRGPR, so the wait below only
+            # sees the version arrive
+            self._read_gpr()
+            self.command = COMMAND_GETAPPVER
+            self._wait_gpr()
+            self._read_gpr()
+        finally:
+            self._set_mode_fast(curr_mode)
         return "%d.%d.%d" % (self._buf[4], self._buf[5], self._buf[6])
 
     @property
@@ -193,12 +364,16 @@ class ENS160:
 
     @mode.setter
     def mode(self, newmode: Literal[0, 1, 2, 240]) -> None:
-        if not newmode in _valid_modes:
+        if newmode not in _VALID_MODES:
             raise RuntimeError(
                 "Invalid mode: must be MODE_SLEEP, MODE_IDLE, MODE_STANDARD, or MODE_RESET"
             )
         self._mode = newmode
 
+    def _set_mode_fast(self, newmode: int) -> None:
+        """Set the mode without validation, for internal use with known-good modes"""
+        self._mode = newmode
+
     @property
     def temperature_compensation(self) -> float:
         """Temperature compensation setting, set this to ambient temperature
@@ -207,7 +382,13 @@ class ENS160:
 
     @temperature_compensation.setter
     def temperature_compensation(self, temp_c: float) -> None:
-        self._temp_in = int((temp_c + 273.15) * 64.0 + 0.5)
+        self._temp_in = _temp_c_to_raw(temp_c)
+
+    def set_temp_compensation_c10(self, temp_c10: int) -> None:
+        """Set the temperature compensation from integer tenths of a degree C,
+        e.g. 253 for 25.3 *C. Uses integer math only, which is much faster than
+        :attr:`temperature_compensation` on boards without an FPU"""
+        self._temp_in = _temp_c10_to_raw(temp_c10)
 
     @property
     def humidity_compensation(self) -> float:
@@ -217,4 +398,25 @@ class ENS160:
 
     @humidity_compensation.setter
     def humidity_compensation(self, hum_perc: float) -> None:
-        self._rh_in = int(hum_perc * 512 + 0.5)
+        self._rh_in = _hum_perc_to_raw(hum_perc)
+
+    def set_humidity_compensation_pct10(self, hum_perc10: int) -> None:
+        """Set the humidity compensation from integer tenths of a percent,
+        e.g. 455 for 45.5 %. Uses integer math only, which is much faster than
+        :attr:`humidity_compensation` on boards without an FPU"""
+        self._rh_in = _hum_perc10_to_raw(hum_perc10)
+
+    def set_compensation(self, temp_c: float, hum_perc: float) -> None:
+        """Set both the temperature (degrees C) and relative humidity (percentage
+        0-100) compensation in a single I2C write"""
+        # TEMP_IN and RH_IN are contiguous (0x13-0x16)
+        struct.pack_into(
+            "<BHH",
+            self._buf,
+            0,
+            _ENS160_REG_TEMPIN,
+            _temp_c_to_raw(temp_c),
+            _hum_perc_to_raw(hum_perc),
+        )
+        with self.i2c_device as i2c:
+            i2c.write(self._buf, end=5)
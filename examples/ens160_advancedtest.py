@@ -2,14 +2,15 @@
 #
 # SPDX-License-Identifier: Unlicense
 
-import time
 import board
 import adafruit_ens160
 
 i2c = board.I2C()  # uses board.SCL and board.SDA
 # i2c = board.STEMMA_I2C()  # For using the built-in STEMMA QT connector on a microcontroller
 
-ens = adafruit_ens160.ENS160(i2c)
+# Connect the sensor's INT pin to D5 so we are told when new data is ready,
+# instead of polling the sensor over I2C
+ens = adafruit_ens160.ENS160(i2c, int_pin=board.D5)
 print("Firmware Vers: ", ens.firmware_version)
 
 ens.mode = adafruit_ens160.MODE_STANDARD
@@ -31,16 +32,9 @@ ens.humidity_compensation = 50
 print("Current rel humidity compensation = %0.1f %%" % ens.humidity_compensation)
 print()
 
-# We can have the INT pin tell us when new data is available
-ens.interrupt_pushpull = True  # use pushpull 3V, not open-drain
-ens.interrupt_on_data = True  # Tell us when there's new calculated data
-ens.interrupt_polarity = False  # Active 'low' (false)
-ens.interrupt_enable = True  # enable pin
-
 while True:
-    # if no data, loop over
-    if not ens.new_data_available:
-        time.sleep(0.1)
+    # wait for the INT pin to signal new data, loop over on timeout
+    if not ens.wait_for_sample(timeout=2):
         continue
 
     # Check status
@@ -40,6 +40,8 @@ board.DISPLAY.root_group = main_group
 
 # begin main loop
 while True:
+    # read the status and all sensor data in one go
+    ens.refresh()
     # Update the label.text property to change the text on the display
     display_output_label.text = (
         f"AQI:{ens.AQI} (1-5), TVOC:{ens.TVOC} ppb, eCO2:{ens.eCO2} ppm"
@@ -19,6 +19,8 @@ ens.humidity_compensation = 50
 
 
 while True:
+    # read the status and all sensor data in one go
+    ens.refresh()
     print("AQI (1-5):", ens.AQI)
     print("TVOC (ppb):", ens.TVOC)
     print("eCO2 (ppm):", ens.eCO2)